@@ -30,8 +30,8 @@ def example_with_real_videos():
     for video_path, video_id in video_files:
         if os.path.exists(video_path):
             print(f"Processing {video_id}...")
-            chunks = processor.process_video(video_path, video_id)
-            search_engine.add_chunks(chunks)
+            chunks, embeddings = processor.process_video(video_path, video_id)
+            search_engine.add_chunks(chunks, embeddings)
             print(f"✅ Added {len(chunks)} chunks from {video_id}")
         else:
             print(f"⚠️  Video file not found: {video_path}")
@@ -68,8 +68,8 @@ def example_with_mock_data():
     
     # Load mock data
     print("📝 Loading mock transcript data...")
-    chunks = generate_mock_transcripts()
-    search_engine.add_chunks(chunks)
+    chunks, embeddings = generate_mock_transcripts()
+    search_engine.add_chunks(chunks, embeddings)
     
     print(f"✅ Loaded {len(chunks)} chunks from {len(search_engine.get_all_videos())} videos")
     
@@ -83,9 +83,9 @@ def example_with_mock_data():
     ]
     
     print("\n🔍 Search results:")
-    for query in queries:
+    all_results = search_engine.search_batch(queries, top_k=2)
+    for query, results in zip(queries, all_results):
         print(f"\nQuery: '{query}'")
-        results = search_engine.search(query, top_k=2)
         
         for i, result in enumerate(results, 1):
             print(f"  {i}. {result['video_id']} @ {result['timestamp_formatted']}")
@@ -101,8 +101,8 @@ def example_video_specific_search():
     
     # Initialize components
     search_engine = VideoSearchEngine()
-    chunks = generate_mock_transcripts()
-    search_engine.add_chunks(chunks)
+    chunks, embeddings = generate_mock_transcripts()
+    search_engine.add_chunks(chunks, embeddings)
     
     # Search within a specific video
     video_id = "video_001"
@@ -136,8 +136,8 @@ def example_batch_processing():
     for video_id, title in video_batch:
         print(f"Processing {video_id}: {title}")
         # In real usage, you would process actual video files here
-        # chunks = processor.process_video(f"videos/{video_id}.mp4", video_id)
-        # search_engine.add_chunks(chunks)
+        # chunks, embeddings = processor.process_video(f"videos/{video_id}.mp4", video_id)
+        # search_engine.add_chunks(chunks, embeddings)
     
     print("✅ Batch processing completed")
     
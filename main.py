@@ -55,6 +55,97 @@ def print_video_info(video_id, summary, chunks):
         print(f"{i}. [{chunk['timestamp_formatted']}] {chunk['text']}")
     print()
 
+def do_quit(search_engine, arg, results=None):
+    """Exit the application."""
+    print("👋 Goodbye!")
+    return False
+
+def do_help(search_engine, arg, results=None):
+    """Show available commands."""
+    print_help()
+    return True
+
+def do_list(search_engine, arg, results=None):
+    """List all available videos."""
+    videos = search_engine.get_all_videos()
+    print(f"📚 Available videos ({len(videos)}):")
+    for video_id in videos:
+        summary = search_engine.get_video_summary(video_id)
+        print(f"  • {video_id} ({summary['duration_formatted']})")
+    print()
+    return True
+
+def do_video(search_engine, video_id, results=None):
+    """Show information about a specific video."""
+    if not video_id:
+        print("❌ Usage: video <video_id>")
+        return True
+    
+    summary = search_engine.get_video_summary(video_id)
+    if summary:
+        chunk_data = search_engine.get_video_chunks(video_id)
+        print_video_info(video_id, summary, chunk_data)
+    else:
+        print(f"❌ Video '{video_id}' not found.")
+    return True
+
+def do_search(search_engine, query, results=None):
+    """Search across all videos, using precomputed results when given."""
+    if not query:
+        print("❌ Usage: search <query>")
+        return True
+    
+    print(f"🔍 Searching for: '{query}'")
+    if results is None:
+        results = search_engine.search(query, top_k=5)
+    print_search_results(results)
+    return True
+
+# Command name -> handler(search_engine, arg, results=None); handlers return False to exit
+COMMAND_HANDLERS = {
+    'quit': do_quit,
+    'exit': do_quit,
+    'help': do_help,
+    'list': do_list,
+    'video': do_video,
+    'search': do_search,
+}
+
+def parse_command(line):
+    """Split a command line into (command, argument)."""
+    parts = line.strip().lower().split(" ", 1)
+    return parts[0], parts[1].strip() if len(parts) == 2 else ""
+
+def dispatch(search_engine, command, arg, results=None):
+    """Run a single command; returns False when the application should exit."""
+    handler = COMMAND_HANDLERS.get(command)
+    if handler is None:
+        print("❌ Unknown command. Type 'help' for available commands.")
+        return True
+    return handler(search_engine, arg, results)
+
+def run_batch(search_engine, lines):
+    """Run piped commands, embedding and searching all queries in one batch."""
+    commands = []
+    for line in lines:
+        if not line.strip():
+            continue
+        commands.append(parse_command(line))
+        if COMMAND_HANDLERS.get(commands[-1][0]) is do_quit:
+            break
+    
+    queries = [arg for command, arg in commands if command == "search" and arg]
+    batched_results = iter(search_engine.search_batch(queries, top_k=5))
+    
+    for command, arg in commands:
+        print(f"🎯 {command} {arg}".rstrip())
+        results = next(batched_results) if command == "search" and arg else None
+        try:
+            if not dispatch(search_engine, command, arg, results):
+                break
+        except Exception as e:
+            print(f"❌ Error: {e}")
+
 def main():
     """Main application loop."""
     print_banner()
@@ -65,60 +156,32 @@ def main():
     
     # Generate mock transcript data
     print("📝 Loading mock transcript data...")
-    chunks = generate_mock_transcripts()
-    search_engine.add_chunks(chunks)
+    chunks, embeddings = generate_mock_transcripts()
+    search_engine.add_chunks(chunks, embeddings)
     
     print(f"✅ Loaded {len(chunks)} transcript chunks from {len(search_engine.get_all_videos())} videos")
     print()
     
+    # Piped input: read every command up front so searches can be batched
+    if not sys.stdin.isatty():
+        run_batch(search_engine, sys.stdin.read().splitlines())
+        return
+    
+    try:
+        import readline  # noqa: F401 - enables line editing and history for input()
+    except ImportError:
+        pass
+    
     # Main interaction loop
     while True:
         try:
-            command = input("🎯 Enter command (or 'help'): ").strip().lower()
-            
-            if command == "quit" or command == "exit":
-                print("👋 Goodbye!")
+            command, arg = parse_command(input("🎯 Enter command (or 'help'): "))
+            if not command:
+                continue
+            if not dispatch(search_engine, command, arg):
                 break
-            elif command == "help":
-                print_help()
-            elif command == "list":
-                videos = search_engine.get_all_videos()
-                print(f"📚 Available videos ({len(videos)}):")
-                for video_id in videos:
-                    summary = search_engine.get_video_summary(video_id)
-                    print(f"  • {video_id} ({summary['duration_formatted']})")
-                print()
-            elif command.startswith("video "):
-                parts = command.split(" ", 1)
-                if len(parts) == 2:
-                    video_id = parts[1]
-                    summary = search_engine.get_video_summary(video_id)
-                    if summary:
-                        video_chunks = [chunk for chunk in chunks if chunk.video_id == video_id]
-                        chunk_data = []
-                        for chunk in video_chunks:
-                            chunk_data.append({
-                                'timestamp_formatted': search_engine._format_timestamp(chunk.start_time),
-                                'text': chunk.text
-                            })
-                        print_video_info(video_id, summary, chunk_data)
-                    else:
-                        print(f"❌ Video '{video_id}' not found.")
-                else:
-                    print("❌ Usage: video <video_id>")
-            elif command.startswith("search "):
-                parts = command.split(" ", 1)
-                if len(parts) == 2:
-                    query = parts[1]
-                    print(f"🔍 Searching for: '{query}'")
-                    results = search_engine.search(query, top_k=5)
-                    print_search_results(results)
-                else:
-                    print("❌ Usage: search <query>")
-            else:
-                print("❌ Unknown command. Type 'help' for available commands.")
                 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             print("\n👋 Goodbye!")
             break
         except Exception as e:
@@ -130,8 +193,8 @@ def demo_search():
     
     # Initialize search engine
     search_engine = VideoSearchEngine()
-    chunks = generate_mock_transcripts()
-    search_engine.add_chunks(chunks)
+    chunks, embeddings = generate_mock_transcripts()
+    search_engine.add_chunks(chunks, embeddings)
     
     # Demo queries
     demo_queries = [
@@ -142,9 +205,9 @@ def demo_search():
         "backpropagation training"
     ]
     
-    for query in demo_queries:
+    all_results = search_engine.search_batch(demo_queries, top_k=3)
+    for query, results in zip(demo_queries, all_results):
         print(f"\n🔍 Query: '{query}'")
-        results = search_engine.search(query, top_k=3)
         print_search_results(results)
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Export the sentence transformer to an int8-quantized ONNX model
+
+Writes model_int8.onnx, tokenizer.json and the model's sentence-transformers
+pooling and max-length config into the output directory, ready for
+TranscriptProcessor(use_onnx=True). Requires: pip install "optimum[onnxruntime]"
+
+Usage:
+    python scripts/export_onnx.py [output_dir] [model_id]
+
+output_dir defaults to onnx/<model name>, where TranscriptProcessor looks for it.
+"""
+
+import json
+import os
+import sys
+from typing import Optional
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.models import Pooling
+from transformers import AutoTokenizer
+
+DEFAULT_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+def export_onnx(output_dir: Optional[str] = None, model_id: str = DEFAULT_MODEL_ID):
+    """Export model_id to ONNX in output_dir and add a dynamically int8-quantized copy."""
+    # Same layout as transcript_processor.default_onnx_model_dir
+    output_dir = output_dir or os.path.join("onnx", model_id.split("/")[-1])
+    print(f"📦 Exporting {model_id} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(output_dir)
+    
+    # Pooling and truncation live in the sentence-transformers wrapper, not the exported transformer
+    sentence_model = SentenceTransformer(model_id, device="cpu")
+    with open(os.path.join(output_dir, "sentence_bert_config.json"), "w") as f:
+        json.dump({"max_seq_length": sentence_model.max_seq_length}, f)
+    pooling = next(module for module in sentence_model if isinstance(module, Pooling))
+    os.makedirs(os.path.join(output_dir, "1_Pooling"), exist_ok=True)
+    with open(os.path.join(output_dir, "1_Pooling", "config.json"), "w") as f:
+        json.dump(pooling.get_config_dict(), f)
+    
+    print("🔧 Quantizing to int8...")
+    quantizer = ORTQuantizer.from_pretrained(output_dir)
+    qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig, file_suffix="int8")
+    
+    print(f"✅ Wrote {output_dir}/model_int8.onnx")
+
+if __name__ == "__main__":
+    export_onnx(*sys.argv[1:3])
@@ -1,118 +1,567 @@
-import faiss
 import numpy as np
-from typing import List, Tuple, Dict
-from transcript_processor import TranscriptChunk
-from sentence_transformers import SentenceTransformer
+from typing import List, Tuple, Dict, Optional, Sequence, TYPE_CHECKING
+from transcript_processor import TranscriptChunk, default_onnx_model_dir, load_embedding_model
+from functools import lru_cache
 import json
+import os
+
+# faiss and sentence_transformers are imported where used, so importing this
+# module stays cheap until an engine is actually created
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+@lru_cache(maxsize=None)
+def _load_embedding_model(model_name: str, use_onnx: bool = False,
+                          onnx_model_dir: Optional[str] = None) -> "SentenceTransformer":
+    """Load an embedding backend once per (model, backend)."""
+    return load_embedding_model(model_name, use_onnx, onnx_model_dir)
+
+@lru_cache(maxsize=1024)
+def _embed_query(backend: Tuple[str, bool, Optional[str]], query: str) -> bytes:
+    """Embed a query as normalized float32 bytes, cached per (model backend, query)."""
+    query_embedding = _load_embedding_model(*backend).encode([query], convert_to_numpy=True,
+                                                             normalize_embeddings=True).astype('float32')
+    # Bytes are immutable, so cached entries can't be modified by callers
+    return query_embedding.tobytes()
+
+class _GrowableArray:
+    """Append-only array whose storage doubles as it fills, so appends are amortized O(1)."""
+    
+    def __init__(self, dtype, data: Optional[np.ndarray] = None):
+        self.dtype = np.dtype(dtype)
+        self._data = data  # Existing rows (e.g. a read-only memory map), copied on first growth
+        self._size = 0 if data is None else len(data)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def array(self) -> np.ndarray:
+        """View of the filled rows."""
+        if self._data is None:
+            return np.empty(0, dtype=self.dtype)
+        return self._data[:self._size]
+    
+    def extend(self, values):
+        """Append rows, reallocating to double the capacity when full."""
+        values = np.asarray(values, dtype=self.dtype)
+        needed = self._size + len(values)
+        if self._data is None or needed > len(self._data):
+            capacity = max(needed, 2 * (0 if self._data is None else len(self._data)), 16)
+            data = np.empty((capacity,) + values.shape[1:], dtype=self.dtype)
+            if self._size:
+                data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._data[self._size:needed] = values
+        self._size = needed
 
 class VideoSearchEngine:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        """Initialize the video search engine with FAISS index and embedding model."""
-        self.embedding_model = SentenceTransformer(model_name)
-        self.chunks: List[TranscriptChunk] = []
+    INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+    # How stored vectors are encoded, for flat and HNSW indexes
+    EMBEDDING_DTYPES = {
+        "fp32": None,
+        "fp16": "QT_fp16",  # faiss.ScalarQuantizer quantizer types
+        "int8": "QT_8bit",
+    }
+    # int8 vectors stay float32 until this many chunks are available to train the quantizer on,
+    # with each dimension's observed range widened by INT8_RANGE_MARGIN for values not yet seen
+    INT8_TRAINING_SIZE = 1000
+    INT8_RANGE_MARGIN = 0.05
+    # Below this many chunks an exhaustive flat scan is fast and exact
+    MIN_APPROX_INDEX_SIZE = 5000
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", index_type: str = "flat",
+                 nlist: int = 100, m: int = 16, nbits: int = 8, embedding_dtype: str = "fp32",
+                 use_onnx: bool = False, onnx_model_dir: Optional[str] = None):
+        """Initialize the video search engine with FAISS index and embedding model.
+        
+        index_type: "flat", "hnsw" or "ivfpq"; nlist, m and nbits configure "ivfpq".
+        embedding_dtype: "fp32", "fp16" or "int8" vector storage, for flat and HNSW indexes.
+        use_onnx, onnx_model_dir: query embedding backend; match the TranscriptProcessor's.
+        """
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{index_type}', expected one of {self.INDEX_TYPES}")
+        if embedding_dtype not in self.EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding_dtype '{embedding_dtype}', "
+                             f"expected one of {tuple(self.EMBEDDING_DTYPES)}")
+        if index_type == "ivfpq" and embedding_dtype != "fp32":
+            raise ValueError("embedding_dtype must be 'fp32' with index_type 'ivfpq'")
+        self.index_type = index_type
+        self.embedding_dtype = embedding_dtype
+        self.nlist = nlist
+        self.m = m
+        self.nbits = nbits
+        self._model_name = model_name
+        if use_onnx:
+            onnx_model_dir = os.path.normpath(onnx_model_dir or default_onnx_model_dir(model_name))
+        else:
+            onnx_model_dir = None
+        self._embedding_backend = (model_name, use_onnx, onnx_model_dir)
+        self.embedding_model = _load_embedding_model(*self._embedding_backend)
         self.index = None
         self.dimension = None
+        self._int8_codec = None  # Copy of the int8 index's trained faiss.ScalarQuantizer, for the stored rows
+        # Normalized embeddings, one row per chunk (and per vector in the index)
+        self._all_emb = _GrowableArray(self._storage_dtype())
+        # Chunk metadata as parallel columns, row-aligned with _all_emb
+        self._video_ids = _GrowableArray(object)
+        self._start_times = _GrowableArray(np.float64)
+        self._end_times = _GrowableArray(np.float64)
+        self._texts: List[str] = []
+        # Per-video state maintained by add_chunks: chunk_indices, total_duration, chunk_count
+        self._videos: Dict[str, Dict] = {}
+        # GPU copy of the index for batched search, rebuilt after the index changes
+        self._gpu_res = None
+        self._gpu_index = None
+        
+    def add_chunks(self, chunks: List[TranscriptChunk], embeddings: np.ndarray):
+        """Add transcript chunks and their (N, d) embedding matrix to the search index."""
+        if len(chunks) != len(embeddings):
+            raise ValueError(f"Got {len(chunks)} chunks but {len(embeddings)} embeddings")
+        if not chunks:
+            return
+        
+        import faiss
+        
+        # Copy into an owned, contiguous float32 block
+        embeddings = np.array(embeddings, dtype='float32')
+        faiss.normalize_L2(embeddings)  # Unit vectors so inner product == cosine similarity
+        
+        d = embeddings.shape[1]
+        if self.index is None and self.index_type == "ivfpq" and d % self.m:
+            raise ValueError(f"m={self.m} must divide the embedding dimension {d} for index_type 'ivfpq'")
+        
+        # Initialize FAISS index if not already done, or upgrade a flat fallback
+        # once the corpus is large enough for the requested index type. This runs
+        # before any rows are stored, so a failure leaves the engine unchanged.
+        first_row = len(self._texts)
+        outgrew_flat = (self.index_type != "flat"
+                        and first_row < self._approx_index_threshold() <= first_row + len(embeddings))
+        int8_trainable = (self.embedding_dtype == "int8" and self._int8_codec is None
+                          and first_row < self.INT8_TRAINING_SIZE <= first_row + len(embeddings))
+        if self.index is None or outgrew_flat or int8_trainable:
+            all_embeddings = embeddings if first_row == 0 else np.concatenate(
+                [self._decode_stored(self._all_emb.array), embeddings])
+            self.index = self._build_index(all_embeddings)
+            self.dimension = d
+            if self._all_emb.dtype != self._storage_dtype():
+                # The int8 quantizer was just trained; re-encode the float32 rows kept so far
+                self._all_emb = _GrowableArray(self._storage_dtype())
+                self._all_emb.extend(self._encode_stored(all_embeddings[:first_row]))
+        else:
+            # Add embeddings to FAISS index
+            self.index.add(embeddings)  # type: ignore
+        self._gpu_index = None
+        
+        # Keep a row-aligned copy for per-video scoring
+        self._all_emb.extend(self._encode_stored(embeddings))
+        # Split chunks into metadata columns in a single pass
+        video_ids, start_times, end_times, texts = zip(*[
+            (chunk.video_id, chunk.start_time, chunk.end_time, chunk.text) for chunk in chunks])
+        self._append_metadata(video_ids, start_times, end_times, texts)
+    
+    def _approx_index_threshold(self) -> int:
+        """Corpus size at which the configured approximate index replaces the flat one."""
+        if self.index_type == "ivfpq":
+            # Enough points for faiss to train the coarse quantizer and the PQ codebooks
+            return max(self.MIN_APPROX_INDEX_SIZE, 39 * 2 ** self.nbits, 39 * self.nlist)
+        return self.MIN_APPROX_INDEX_SIZE
+    
+    def _append_metadata(self, video_ids: Sequence[str], start_times: Sequence[float],
+                         end_times: Sequence[float], texts: Sequence[str]):
+        """Append row-aligned metadata columns for newly stored chunks."""
+        first_row = len(self._texts)
+        self._video_ids.extend(video_ids)
+        self._start_times.extend(start_times)
+        self._end_times.extend(end_times)
+        self._texts.extend(texts)
         
-    def add_chunks(self, chunks: List[TranscriptChunk]):
-        """Add transcript chunks to the search index."""
-        self.chunks.extend(chunks)
-        
-        # Initialize FAISS index if not already done
-        if self.index is None and chunks:
-            valid_chunks = [chunk for chunk in chunks if chunk.embedding is not None]
-            if valid_chunks:
-                self.dimension = valid_chunks[0].embedding.shape[0]  # type: ignore
-                self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
-            
-        # Add embeddings to FAISS index
-        if chunks:
-            valid_chunks = [chunk for chunk in chunks if chunk.embedding is not None]
-            if valid_chunks:
-                embeddings = np.array([chunk.embedding for chunk in valid_chunks])  # type: ignore
-                self.index.add(embeddings.astype('float32'))  # type: ignore
+        for row, (video_id, end_time) in enumerate(zip(video_ids, end_times), first_row):
+            video = self._videos.get(video_id)
+            if video is None:
+                video = self._videos[video_id] = {'chunk_indices': [], 'total_duration': 0.0, 'chunk_count': 0}
+            video['chunk_indices'].append(row)
+            video['total_duration'] = max(video['total_duration'], end_time)
+            video['chunk_count'] += 1
+    
+    def _storage_dtype(self):
+        """numpy dtype of the engine's own embedding copy (int8 is stored as scalar quantizer codes)."""
+        if self.embedding_dtype == "int8":
+            return np.float32 if self._int8_codec is None else np.uint8
+        return {"fp16": np.float16}.get(self.embedding_dtype, np.float32)
+    
+    def _encode_stored(self, embeddings: np.ndarray) -> np.ndarray:
+        """Convert normalized float32 embeddings to the engine's storage dtype."""
+        if self.embedding_dtype == "fp16":
+            return embeddings.astype(np.float16)  # Same encoding as QT_fp16
+        if self._int8_codec is not None:
+            return self._int8_codec.compute_codes(embeddings)
+        return embeddings
+    
+    def _decode_stored(self, stored: np.ndarray) -> np.ndarray:
+        """Convert stored embeddings back to float32, as the index reconstructs them."""
+        if stored.dtype == np.uint8:
+            return self._int8_codec.decode(np.ascontiguousarray(stored))
+        return np.asarray(stored, dtype=np.float32)
+    
+    def _scalar_quantizer_type(self, n_vectors: int):
+        """faiss ScalarQuantizer type for an index over n_vectors, or None to store float32."""
+        import faiss
+        
+        qtype_name = self.EMBEDDING_DTYPES[self.embedding_dtype]
+        if qtype_name is None or (self.embedding_dtype == "int8" and self._int8_codec is None
+                                  and n_vectors < self.INT8_TRAINING_SIZE):
+            return None
+        return getattr(faiss.ScalarQuantizer, qtype_name)
+    
+    def _train_scalar_quantizer(self, index, embeddings: np.ndarray):
+        """Train a scalar-quantized index, reusing the engine's int8 codec once it exists."""
+        import faiss
+        
+        sq_index = self._scalar_quantizer_index(index)
+        if self.embedding_dtype != "int8":
+            index.train(embeddings)  # fp16 needs no statistics
+        elif self._int8_codec is None:
+            sq_index.sq.rangestat_arg = self.INT8_RANGE_MARGIN
+            index.train(embeddings)
+            self._int8_codec = self._copy_int8_codec(sq_index)
+        else:
+            faiss.copy_array_to_vector(faiss.vector_to_array(self._int8_codec.trained), sq_index.sq.trained)
+            sq_index.is_trained = index.is_trained = True
+    
+    @staticmethod
+    def _scalar_quantizer_index(index):
+        """The IndexScalarQuantizer holding an SQ or HNSW-SQ index's quantizer."""
+        import faiss
+        
+        return index if hasattr(index, "sq") else faiss.downcast_index(index.storage)
+    
+    @staticmethod
+    def _copy_int8_codec(sq_index):
+        """Standalone copy of a trained int8 index's scalar quantizer."""
+        import faiss
+        
+        codec = faiss.ScalarQuantizer(sq_index.d, faiss.ScalarQuantizer.QT_8bit)
+        faiss.copy_array_to_vector(faiss.vector_to_array(sq_index.sq.trained), codec.trained)
+        return codec
+    
+    def _build_index(self, embeddings: np.ndarray):
+        """Build a FAISS index of the configured type containing the given embeddings."""
+        import faiss
+        
+        d = embeddings.shape[1]
+        qtype = self._scalar_quantizer_type(len(embeddings))
+        
+        if self.index_type == "flat" or len(embeddings) < self._approx_index_threshold():
+            if qtype is None:
+                index = faiss.IndexFlatIP(d)  # Inner product for cosine similarity
+            else:
+                index = faiss.IndexScalarQuantizer(d, qtype, faiss.METRIC_INNER_PRODUCT)
+                self._train_scalar_quantizer(index, embeddings)
+        elif self.index_type == "hnsw":
+            if qtype is None:
+                index = faiss.IndexHNSWFlat(d, 32, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexHNSWSQ(d, qtype, 32, faiss.METRIC_INNER_PRODUCT)
+                self._train_scalar_quantizer(index, embeddings)
+            index.hnsw.efConstruction = 200
+            index.hnsw.efSearch = 64
+        else:
+            quantizer = faiss.IndexFlatIP(d)
+            ivfpq = faiss.IndexIVFPQ(quantizer, d, self.nlist, self.m, self.nbits, faiss.METRIC_INNER_PRODUCT)
+            opq = faiss.OPQMatrix(d, self.m)
+            # Train the rotation with the same codebook size as the index (faiss defaults to 8 bits)
+            opq_pq = faiss.ProductQuantizer(d, self.m, self.nbits)
+            opq.pq = opq_pq
+            index = faiss.IndexPreTransform(opq, ivfpq)
+            index.train(embeddings)
+            opq.pq = None  # Only needed for training; don't keep a pointer to the Python-owned object
+            faiss.extract_index_ivf(index).nprobe = 16
+        
+        index.add(embeddings)
+        return index
     
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
         """Search for the most similar video chunks to the given query."""
-        if not self.chunks or self.index is None:
+        if not self._texts or self.index is None:
             return []
         
         # Embed the query
-        query_embedding = self.embedding_model.encode([query])
+        query_embedding = self._query_vector(query)
         
         # Search in FAISS index
-        scores, indices = self.index.search(query_embedding.astype('float32'), top_k)  # type: ignore
+        scores, indices = self.index.search(query_embedding, top_k)  # type: ignore
         
         # Return results with metadata
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            chunk = self.chunks[idx]
-            results.append({
-                'video_id': chunk.video_id,
-                'start_time': chunk.start_time,
-                'end_time': chunk.end_time,
-                'text': chunk.text,
-                'similarity_score': float(score),
-                'timestamp_formatted': self._format_timestamp(chunk.start_time)
-            })
+        return self._build_results(indices[0], scores[0])
+    
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """Search for several queries at once, returning one result list per query.
         
+        All queries are embedded in a single forward pass and searched with one
+        FAISS call, on the GPU when one is available.
+        """
+        columns = self._search_batch_columns(queries, top_k)
+        
+        results: List[List[Dict]] = [[] for _ in queries]
+        for query_index, video_id, start_time, end_time, text, score, timestamp in zip(
+                columns['query_index'], columns['video_id'], columns['start_time'], columns['end_time'],
+                columns['text'], columns['similarity_score'], columns['timestamp_formatted']):
+            results[query_index].append({
+                'video_id': video_id,
+                'start_time': start_time,
+                'end_time': end_time,
+                'text': text,
+                'similarity_score': score,
+                'timestamp_formatted': timestamp
+            })
         return results
     
+    def search_batch_frame(self, queries: List[str], top_k: int = 5):
+        """Like search_batch, but return every hit as one row of a pandas DataFrame.
+        
+        Rows carry query_index and rank columns identifying the query and the hit's
+        position in its results.
+        """
+        import pandas as pd
+        
+        return pd.DataFrame(self._search_batch_columns(queries, top_k))
+    
+    def _search_batch_columns(self, queries: List[str], top_k: int) -> Dict[str, List]:
+        """Run a batched search and gather all hits' metadata as flat columns."""
+        columns: Dict[str, List] = {name: [] for name in (
+            'query_index', 'rank', 'video_id', 'start_time', 'end_time',
+            'text', 'similarity_score', 'timestamp_formatted')}
+        if not queries or not self._texts or self.index is None:
+            return columns
+        
+        # Embed all queries together
+        query_embeddings = self.embedding_model.encode(queries, convert_to_numpy=True, normalize_embeddings=True,
+                                                       batch_size=32, show_progress_bar=False)
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        
+        # Search in FAISS index
+        scores, indices = self._batch_search_index().search(query_embeddings, top_k)  # type: ignore
+        
+        # Gather metadata for all queries' hits in one pass over the flattened (B * k) results,
+        # dropping the -1 padding approximate indexes use for missing hits
+        n_queries, k = indices.shape
+        flat_idx = indices.ravel()
+        keep = flat_idx >= 0
+        rows = flat_idx[keep]
+        start_times = self._start_times.array[rows]
+        
+        columns['query_index'] = np.repeat(np.arange(n_queries), k)[keep].tolist()
+        columns['rank'] = np.tile(np.arange(k), n_queries)[keep].tolist()
+        columns['video_id'] = self._video_ids.array[rows].tolist()
+        columns['start_time'] = start_times.tolist()
+        columns['end_time'] = self._end_times.array[rows].tolist()
+        columns['text'] = [self._texts[row] for row in rows.tolist()]
+        columns['similarity_score'] = scores.ravel()[keep].tolist()
+        columns['timestamp_formatted'] = self._format_timestamps_vec(start_times)
+        return columns
+    
+    def _batch_search_index(self):
+        """Return a GPU copy of the index if a GPU is available, else the CPU index."""
+        import faiss
+        
+        if self._gpu_index is not None:
+            return self._gpu_index
+        if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+            return self.index
+        
+        try:
+            if self._gpu_res is None:
+                self._gpu_res = faiss.StandardGpuResources()
+            self._gpu_index = faiss.index_cpu_to_gpu(self._gpu_res, 0, self.index)
+        except RuntimeError:
+            # Not every index type has a GPU implementation (e.g. HNSW)
+            return self.index
+        return self._gpu_index
+    
+    def _build_results(self, rows: np.ndarray, scores: np.ndarray) -> List[Dict]:
+        """Build result dicts for matched rows, best first."""
+        # Approximate indexes pad missing hits with -1
+        keep = rows >= 0
+        rows, scores = rows[keep], scores[keep]
+        start_times = self._start_times.array[rows].tolist()
+        
+        return [
+            {
+                'video_id': video_id,
+                'start_time': start_time,
+                'end_time': end_time,
+                'text': self._texts[row],
+                'similarity_score': score,
+                'timestamp_formatted': self._format_timestamp(start_time)
+            }
+            for row, score, video_id, start_time, end_time in zip(
+                rows.tolist(), scores.tolist(), self._video_ids.array[rows],
+                start_times, self._end_times.array[rows].tolist())
+        ]
+    
+    def _query_vector(self, query: str) -> np.ndarray:
+        """Embed a query as a normalized, read-only (1, d) float32 view of the cached bytes."""
+        return np.frombuffer(_embed_query(self._embedding_backend, query), dtype=np.float32).reshape(1, -1)
+    
     def _format_timestamp(self, seconds: float) -> str:
         """Format seconds into MM:SS format."""
-        minutes = int(seconds // 60)
-        secs = int(seconds % 60)
-        return f"{minutes:02d}:{secs:02d}"
+        return self._fmt_ts_cached(int(seconds))
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _fmt_ts_cached(secs_int: int) -> str:
+        """Format whole seconds into MM:SS, memoized since timestamps repeat across results."""
+        return f"{secs_int // 60:02d}:{secs_int % 60:02d}"
+    
+    @staticmethod
+    def _format_timestamps_vec(seconds: np.ndarray) -> List[str]:
+        """Format an array of seconds into MM:SS strings in one vectorized pass."""
+        seconds = np.asarray(seconds)
+        if seconds.size == 0:
+            return []  # np.char.zfill fails on empty arrays under numpy 2
+        minutes = np.char.zfill((seconds // 60).astype(int).astype(str), 2)
+        secs = np.char.zfill((seconds % 60).astype(int).astype(str), 2)
+        return np.char.add(np.char.add(minutes, ":"), secs).tolist()
     
     def get_video_summary(self, video_id: str) -> Dict:
         """Get summary information for a specific video."""
-        video_chunks = [chunk for chunk in self.chunks if chunk.video_id == video_id]
+        video = self._videos.get(video_id)
         
-        if not video_chunks:
+        if video is None:
             return {}
         
-        total_duration = max(chunk.end_time for chunk in video_chunks)
-        chunk_count = len(video_chunks)
+        total_duration = video['total_duration']
         
         return {
             'video_id': video_id,
             'total_duration': total_duration,
-            'chunk_count': chunk_count,
+            'chunk_count': video['chunk_count'],
             'duration_formatted': self._format_timestamp(total_duration)
         }
     
+    def get_video_chunks(self, video_id: str) -> List[Dict]:
+        """Get the chunks of a video in index order with formatted timestamps."""
+        video = self._videos.get(video_id)
+        
+        if video is None:
+            return []
+        
+        rows = video['chunk_indices']
+        start_times = self._start_times.array[rows]
+        timestamps = self._format_timestamps_vec(start_times)
+        
+        return [
+            {
+                'start_time': start_time,
+                'end_time': end_time,
+                'text': self._texts[row],
+                'timestamp_formatted': timestamp
+            }
+            for row, start_time, end_time, timestamp in zip(
+                rows, start_times.tolist(), self._end_times.array[rows].tolist(), timestamps)
+        ]
+    
     def get_all_videos(self) -> List[str]:
         """Get list of all video IDs in the index."""
-        return list(set(chunk.video_id for chunk in self.chunks))
+        return list(self._videos.keys())
     
     def search_by_video(self, video_id: str, query: str, top_k: int = 3) -> List[Dict]:
         """Search within a specific video only."""
-        video_chunks = [chunk for chunk in self.chunks if chunk.video_id == video_id]
+        video = self._videos.get(video_id)
         
-        if not video_chunks:
+        if video is None or top_k <= 0:
             return []
+        rows = video['chunk_indices']
         
-        # Create temporary index for this video
-        temp_index = faiss.IndexFlatIP(self.dimension)
-        valid_chunks = [chunk for chunk in video_chunks if chunk.embedding is not None]
-        if valid_chunks:
-            embeddings = np.array([chunk.embedding for chunk in valid_chunks])  # type: ignore
-            temp_index.add(embeddings.astype('float32'))  # type: ignore
+        # Score this video's rows directly; cheaper than building a temporary index
+        query_embedding = self._query_vector(query)
+        scores = self._decode_stored(self._all_emb.array[rows]) @ query_embedding[0]
         
-        # Search
-        query_embedding = self.embedding_model.encode([query])
-        scores, indices = temp_index.search(query_embedding.astype('float32'), top_k)  # type: ignore
+        k = min(top_k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
         
         # Return results
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            chunk = video_chunks[idx]
-            results.append({
-                'video_id': chunk.video_id,
-                'start_time': chunk.start_time,
-                'end_time': chunk.end_time,
-                'text': chunk.text,
-                'similarity_score': float(score),
-                'timestamp_formatted': self._format_timestamp(chunk.start_time)
-            })
+        return self._build_results(np.asarray(rows)[top], scores[top])
+    
+    def save(self, path: str):
+        """Save the FAISS index, embeddings and chunk metadata to a directory."""
+        if self.index is None:
+            raise ValueError("Nothing to save: no chunks have been added")
+        
+        import faiss
+        
+        os.makedirs(path, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(path, "idx.faiss"))
+        np.save(os.path.join(path, "emb.npy"), self._all_emb.array)
+        
+        metadata = {
+            'model_name': self._model_name,
+            'use_onnx': self._embedding_backend[1],
+            'onnx_model_dir': self._embedding_backend[2],
+            'index_type': self.index_type,
+            'nlist': self.nlist,
+            'm': self.m,
+            'nbits': self.nbits,
+            'embedding_dtype': self.embedding_dtype,
+            'chunks': [
+                {
+                    'video_id': video_id,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'text': text
+                }
+                for video_id, start_time, end_time, text in zip(
+                    self._video_ids.array, self._start_times.array.tolist(),
+                    self._end_times.array.tolist(), self._texts)
+            ]
+        }
+        with open(os.path.join(path, "metadata.json"), "w") as f:
+            json.dump(metadata, f)
+    
+    def load(self, path: str):
+        """Replace this engine's contents with an index saved by save().
+        
+        Embeddings are memory-mapped rather than read into RAM.
+        """
+        import faiss
+        
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+        if metadata['model_name'] != self._model_name:
+            raise ValueError(f"Index at '{path}' was built with '{metadata['model_name']}', "
+                             f"not '{self._model_name}'")
+        # Queries must come from the backend the stored chunks were embedded with
+        saved_backend = (metadata['model_name'], metadata.get('use_onnx', False), metadata.get('onnx_model_dir'))
+        if saved_backend != self._embedding_backend:
+            raise ValueError(f"Index at '{path}' was built with use_onnx={saved_backend[1]}, "
+                             f"onnx_model_dir={saved_backend[2]!r}, not use_onnx={self._embedding_backend[1]}, "
+                             f"onnx_model_dir={self._embedding_backend[2]!r}")
+        
+        self.index = faiss.read_index(os.path.join(path, "idx.faiss"))
+        self.dimension = self.index.d
+        self.index_type = metadata['index_type']
+        # Needed to build the approximate index if the saved one is still the flat fallback
+        self.nlist = metadata.get('nlist', self.nlist)
+        self.m = metadata.get('m', self.m)
+        self.nbits = metadata.get('nbits', self.nbits)
+        self.embedding_dtype = metadata.get('embedding_dtype', 'fp32')
+        # Later add_chunks calls copy the mapped rows into memory on first growth
+        stored = np.load(os.path.join(path, "emb.npy"), mmap_mode='r')
+        # int8 rows are codes of the quantizer trained into the saved index
+        self._int8_codec = (self._copy_int8_codec(self._scalar_quantizer_index(self.index))
+                            if stored.dtype == np.uint8 else None)
+        self._all_emb = _GrowableArray(stored.dtype, stored)
+        self._gpu_index = None
         
-        return results 
\ No newline at end of file
+        chunks = metadata['chunks']
+        self._video_ids = _GrowableArray(object)
+        self._start_times = _GrowableArray(np.float64)
+        self._end_times = _GrowableArray(np.float64)
+        self._texts = []
+        self._videos = {}
+        self._append_metadata([chunk['video_id'] for chunk in chunks],
+                              [chunk['start_time'] for chunk in chunks],
+                              [chunk['end_time'] for chunk in chunks],
+                              [chunk['text'] for chunk in chunks])
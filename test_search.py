@@ -3,13 +3,28 @@
 Test script for video search functionality
 """
 
-import sys
+import json
 import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-from transcript_processor import generate_mock_transcripts
+import numpy as np
+import transcript_processor
+from transcript_processor import (TranscriptChunk, TranscriptProcessor, default_onnx_model_dir,
+                                  generate_mock_transcripts, load_embedding_model, merge_slice_segments,
+                                  pool_token_embeddings, _read_sentence_transformer_config)
 from search_engine import VideoSearchEngine
 
+def _random_corpus(n_chunks, dimension, seed=0):
+    """Random unit-vector chunks spread over a few videos."""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n_chunks, dimension)).astype('float32')
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    chunks = [TranscriptChunk(video_id=f"video_{i % 5:03d}", start_time=30.0 * i, end_time=30.0 * (i + 1),
+                              text=f"chunk {i}")
+              for i in range(n_chunks)]
+    return chunks, embeddings
+
 def test_search_functionality():
     """Test the search functionality with mock data."""
     print("🧪 Testing Video Search Functionality")
@@ -21,8 +36,8 @@ def test_search_functionality():
     
     # Load mock data
     print("2. Loading mock transcript data...")
-    chunks = generate_mock_transcripts()
-    search_engine.add_chunks(chunks)
+    chunks, embeddings = generate_mock_transcripts()
+    search_engine.add_chunks(chunks, embeddings)
     
     print(f"✅ Loaded {len(chunks)} chunks from {len(search_engine.get_all_videos())} videos")
     print()
@@ -48,7 +63,15 @@ def test_search_functionality():
         else:
             print("   ❌ No results found")
     
-    print("\n4. Testing video-specific search...")
+    print("\n4. Testing batch search...")
+    batch_results = search_engine.search_batch(test_queries, top_k=2)
+    assert len(batch_results) == len(test_queries)
+    for query, results in zip(test_queries, batch_results):
+        single_results = search_engine.search(query, top_k=2)
+        assert [r['video_id'] for r in results] == [r['video_id'] for r in single_results]
+        print(f"   ✅ '{query}': {len(results)} result(s)")
+    
+    print("\n5. Testing video-specific search...")
     video_id = "video_001"
     print(f"🔍 Searching within {video_id} for 'regression'")
     results = search_engine.search_by_video(video_id, "regression", top_k=2)
@@ -56,12 +79,341 @@ def test_search_functionality():
     for i, result in enumerate(results, 1):
         print(f"   {i}. {result['video_id']} @ {result['timestamp_formatted']} (score: {result['similarity_score']:.3f})")
     
-    print("\n5. Testing video information...")
+    print("\n6. Testing video information...")
     for video_id in search_engine.get_all_videos():
         summary = search_engine.get_video_summary(video_id)
         print(f"   📹 {video_id}: {summary['duration_formatted']} ({summary['chunk_count']} chunks)")
     
     print("\n✅ All tests completed successfully!")
 
+def test_incremental_add_chunks():
+    """Adding chunks one at a time should match adding them all at once."""
+    print("\n🧪 Testing incremental chunk adds")
+    chunks, embeddings = generate_mock_transcripts()
+    
+    bulk_engine = VideoSearchEngine()
+    bulk_engine.add_chunks(chunks, embeddings)
+    
+    incremental_engine = VideoSearchEngine()
+    for i, chunk in enumerate(chunks):
+        incremental_engine.add_chunks([chunk], embeddings[i:i + 1])
+    
+    assert sorted(incremental_engine.get_all_videos()) == sorted(bulk_engine.get_all_videos())
+    for video_id in bulk_engine.get_all_videos():
+        assert incremental_engine.get_video_summary(video_id) == bulk_engine.get_video_summary(video_id)
+        assert incremental_engine.get_video_chunks(video_id) == bulk_engine.get_video_chunks(video_id)
+    assert incremental_engine.search("neural networks", top_k=3) == bulk_engine.search("neural networks", top_k=3)
+    assert (incremental_engine.search_by_video("video_001", "regression", top_k=2)
+            == bulk_engine.search_by_video("video_001", "regression", top_k=2))
+    print("✅ Incremental adds match a bulk add")
+
+def test_approximate_index_upgrade():
+    """Engines start on a flat index and switch to HNSW / IVF-PQ once big enough."""
+    print("\n🧪 Testing flat -> approximate index upgrade")
+    
+    for index_type, options in [("hnsw", {}), ("ivfpq", {'nlist': 4, 'nbits': 4})]:
+        engine = VideoSearchEngine(index_type=index_type, **options)
+        engine.MIN_APPROX_INDEX_SIZE = 300
+        dimension = engine.embedding_model.get_sentence_embedding_dimension()
+        threshold = engine._approx_index_threshold()
+        chunks, embeddings = _random_corpus(threshold + 100, dimension)
+        
+        engine.add_chunks(chunks[:100], embeddings[:100])
+        assert engine.index.ntotal == 100
+        assert type(engine.index).__name__ == "IndexFlatIP"
+        
+        engine.add_chunks(chunks[100:], embeddings[100:])
+        assert engine.index.ntotal == len(chunks)
+        assert type(engine.index).__name__ != "IndexFlatIP"
+        assert len(engine.search("chunk", top_k=5)) == 5
+        print(f"   ✅ {index_type}: upgraded to {type(engine.index).__name__} at {threshold} chunks")
+    
+    # A PQ configuration that can't fit the embeddings fails up front and stores nothing
+    engine = VideoSearchEngine(index_type="ivfpq", m=7)
+    chunks, embeddings = _random_corpus(10, engine.embedding_model.get_sentence_embedding_dimension())
+    try:
+        engine.add_chunks(chunks, embeddings)
+        raise AssertionError("expected ValueError for m not dividing the dimension")
+    except ValueError:
+        pass
+    assert engine.index is None and engine.get_all_videos() == []
+    print("   ✅ invalid ivfpq config rejected without storing chunks")
+
+def _recall_at_k(index, corpus, queries, k=10):
+    """Fraction of exact inner-product top-k neighbours that index also returns."""
+    import faiss
+    
+    exact = faiss.IndexFlatIP(corpus.shape[1])
+    exact.add(corpus)
+    _, expected = exact.search(queries, k)
+    _, found = index.search(queries, k)
+    return np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)])
+
+def test_quantized_incremental_adds():
+    """fp16/int8 engines filled in several batches keep near-exact recall and score consistently."""
+    print("\n🧪 Testing quantized embeddings across batches")
+    
+    # Clustered 384-d unit vectors, closer to real MiniLM embeddings than isotropic noise
+    rng = np.random.default_rng(1)
+    centers = rng.standard_normal((20, 384))
+    vectors = centers[rng.integers(0, 20, 3200)] + 0.5 * rng.standard_normal((3200, 384))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype('float32')
+    corpus, queries = vectors[:3000], vectors[3000:]
+    batches = [(0, 1), (1, 600), (600, 3000)]  # A single-chunk first batch must not fix the quantizer's range
+    
+    for embedding_dtype in ("fp16", "int8"):
+        engine = VideoSearchEngine(embedding_dtype=embedding_dtype)
+        chunks, _ = _random_corpus(len(corpus), 1)
+        for start, stop in batches:
+            engine.add_chunks(chunks[start:stop], corpus[start:stop])
+        recall = _recall_at_k(engine.index, corpus, queries)
+        assert recall >= 0.95, f"{embedding_dtype} recall@10 {recall}"
+        
+        engine = VideoSearchEngine(embedding_dtype=embedding_dtype)
+        chunks, embeddings = _random_corpus(3000, engine.embedding_model.get_sentence_embedding_dimension())
+        for start, stop in batches:
+            engine.add_chunks(chunks[start:stop], embeddings[start:stop])
+        if embedding_dtype == "int8":
+            assert engine._all_emb.dtype == np.uint8
+        global_scores = {(r['video_id'], r['start_time']): r['similarity_score']
+                         for r in engine.search("chunk", top_k=len(chunks))}
+        for result in engine.search_by_video("video_000", "chunk", top_k=10):
+            expected = global_scores[(result['video_id'], result['start_time'])]
+            assert abs(result['similarity_score'] - expected) < 1e-4, embedding_dtype
+        print(f"   ✅ {embedding_dtype}: recall@10 {recall:.3f}, search and search_by_video scores agree")
+
+def test_concurrent_search():
+    """Single-query searches from several threads return their own results."""
+    print("\n🧪 Testing concurrent single-query search")
+    
+    engine = VideoSearchEngine()
+    chunks, embeddings = generate_mock_transcripts()
+    engine.add_chunks(chunks, embeddings)
+    queries = ["neural networks", "linear regression", "gradient descent", "deep learning",
+               "data science", "model training", "overfitting", "python"] * 25
+    
+    expected = [engine.search(query, top_k=3) for query in queries]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(lambda query: engine.search(query, top_k=3), queries)) == expected
+        by_video = list(executor.map(lambda query: engine.search_by_video("video_001", query), queries))
+    assert by_video == [engine.search_by_video("video_001", query) for query in queries]
+    print("   ✅ Threaded searches match serial ones")
+
+def test_search_batch_frame():
+    """search_batch_frame has one row per search_batch hit, tagged with its query and rank."""
+    print("\n🧪 Testing batch search DataFrame")
+    
+    engine = VideoSearchEngine()
+    chunks, embeddings = generate_mock_transcripts()
+    engine.add_chunks(chunks, embeddings)
+    queries = ["neural networks", "regression", "word embeddings"]
+    
+    frame = engine.search_batch_frame(queries, top_k=3)
+    expected = [dict(result, query_index=query_index, rank=rank)
+                for query_index, results in enumerate(engine.search_batch(queries, top_k=3))
+                for rank, result in enumerate(results)]
+    assert list(frame.columns) == ['query_index', 'rank', 'video_id', 'start_time', 'end_time',
+                                   'text', 'similarity_score', 'timestamp_formatted']
+    assert frame.to_dict('records') == expected
+    print(f"   ✅ {len(frame)} rows match search_batch")
+
+class _NoHitsIndex:
+    """Stands in for an approximate index whose probed lists were all empty."""
+    
+    def search(self, queries, k):
+        return np.full((len(queries), k), -np.inf, dtype='float32'), np.full((len(queries), k), -1)
+
+def test_batch_search_without_hits():
+    """Batched searches whose hits are all -1 padding return empty results."""
+    print("\n🧪 Testing batch search with only padded hits")
+    
+    assert VideoSearchEngine._format_timestamps_vec(np.array([])) == []
+    
+    engine = VideoSearchEngine()
+    chunks, embeddings = generate_mock_transcripts()
+    engine.add_chunks(chunks, embeddings)
+    engine._gpu_index = _NoHitsIndex()  # Picked up by _batch_search_index
+    
+    assert engine.search_batch(["neural networks", "regression"], top_k=3) == [[], []]
+    assert len(engine.search_batch_frame(["neural networks"], top_k=3)) == 0
+    print("   ✅ Empty results instead of an error")
+
+def test_save_load_round_trip():
+    """A saved engine reloads with the same results and keeps accepting chunks."""
+    print("\n🧪 Testing save/load round trip")
+    
+    for embedding_dtype in ("fp32", "int8"):
+        engine = VideoSearchEngine(embedding_dtype=embedding_dtype)
+        engine.INT8_TRAINING_SIZE = 20  # Save a trained int8 quantizer
+        chunks, embeddings = _random_corpus(60, engine.embedding_model.get_sentence_embedding_dimension())
+        engine.add_chunks(chunks[:40], embeddings[:40])
+        
+        with tempfile.TemporaryDirectory() as path:
+            engine.save(path)
+            loaded = VideoSearchEngine(embedding_dtype=embedding_dtype)
+            loaded.load(path)
+            
+            assert loaded.search("chunk", top_k=10) == engine.search("chunk", top_k=10)
+            assert loaded.search_by_video("video_001", "chunk") == engine.search_by_video("video_001", "chunk")
+            assert loaded.get_all_videos() == engine.get_all_videos()
+            
+            # Embeddings are a read-only memory map after load; adding must still work
+            loaded.add_chunks(chunks[40:], embeddings[40:])
+            engine.add_chunks(chunks[40:], embeddings[40:])
+            assert loaded.index.ntotal == len(chunks)
+            for video_id in engine.get_all_videos():
+                assert loaded.get_video_summary(video_id) == engine.get_video_summary(video_id)
+            assert loaded.search_by_video("video_001", "chunk", top_k=20) == \
+                engine.search_by_video("video_001", "chunk", top_k=20)
+        print(f"   ✅ {embedding_dtype}: reloaded engine matches and accepts new chunks")
+    
+    # Index settings travel with the saved index, and the embedding backend must match
+    engine = VideoSearchEngine(index_type="ivfpq", nlist=4, m=8, nbits=4)
+    chunks, embeddings = _random_corpus(60, engine.embedding_model.get_sentence_embedding_dimension())
+    engine.add_chunks(chunks, embeddings)
+    with tempfile.TemporaryDirectory() as path:
+        engine.save(path)
+        loaded = VideoSearchEngine(index_type="ivfpq")
+        loaded.load(path)
+        assert (loaded.nlist, loaded.m, loaded.nbits) == (4, 8, 4)
+        assert loaded._approx_index_threshold() == engine._approx_index_threshold()
+        
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+        metadata['use_onnx'] = True
+        with open(os.path.join(path, "metadata.json"), "w") as f:
+            json.dump(metadata, f)
+        try:
+            VideoSearchEngine().load(path)
+            raise AssertionError("expected ValueError for an index embedded with another backend")
+        except ValueError:
+            pass
+    print("   ✅ Index settings restored and embedding backend checked")
+
+def test_embedding_cache():
+    """Cached chunk embeddings are reused across processors, threads and whitespace variants."""
+    print("\n🧪 Testing chunk embedding cache")
+    
+    texts = ["welcome back to the channel", "today we look at  gradient descent", "welcome back to the channel"]
+    chunks = [TranscriptChunk("video_000", 30.0 * i, 30.0 * (i + 1), text) for i, text in enumerate(texts)]
+    respaced = [TranscriptChunk(c.video_id, c.start_time, c.end_time, f"  {' '.join(c.text.split())}\n")
+                for c in chunks]
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        expected = TranscriptProcessor(cache_dir=cache_dir).embed_chunks_matrix(chunks)
+        assert expected.shape[0] == len(chunks) and np.allclose(expected[0], expected[2])
+        
+        # A fresh processor answers from disk, from a worker thread, without loading the model
+        processor = TranscriptProcessor(cache_dir=cache_dir)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            embeddings = executor.submit(processor.embed_chunks_matrix, respaced).result()
+        assert processor._embedding_model is None
+        assert np.allclose(embeddings, expected)
+    print("   ✅ On-disk cache hit for whitespace-normalized texts from another thread")
+    
+    processor = TranscriptProcessor(cache_dir=None)
+    assert np.allclose(processor.embed_chunks_matrix(chunks), expected)
+    processor._embedding_model = None
+    assert np.allclose(processor.embed_chunks_matrix(respaced), expected)
+    assert processor._embedding_model is None
+    print("   ✅ cache_dir=None uses the in-memory cache only")
+    
+    original_size = transcript_processor.EMBEDDING_MEMORY_CACHE_SIZE
+    transcript_processor.EMBEDDING_MEMORY_CACHE_SIZE = 1
+    try:
+        processor = TranscriptProcessor(cache_dir=None)
+        assert np.allclose(processor.embed_chunks_matrix(chunks), expected)
+        assert len(processor._emb_memory_cache) == 1
+    finally:
+        transcript_processor.EMBEDDING_MEMORY_CACHE_SIZE = original_size
+    print("   ✅ In-memory cache is bounded")
+    
+    # ONNX embeddings are cached per exported model file, apart from PyTorch ones
+    model_name = "sentence-transformers/paraphrase-MiniLM-L3-v2"
+    onnx_default = TranscriptProcessor(model_name, cache_dir=None, use_onnx=True)
+    onnx_other = TranscriptProcessor(model_name, cache_dir=None, use_onnx=True, onnx_model_dir="exports/minilm")
+    torch_backend = TranscriptProcessor(model_name, cache_dir=None)
+    assert onnx_default.onnx_model_dir == os.path.join("onnx", "paraphrase-MiniLM-L3-v2")
+    keys = {processor._embedding_key(texts[0]) for processor in (onnx_default, onnx_other, torch_backend)}
+    assert len(keys) == 3
+    print("   ✅ ONNX cache keys follow the model file")
+
+def test_onnx_encoder_config():
+    """The ONNX shim pools and truncates as the exported model's sentence-transformers config says."""
+    print("\n🧪 Testing ONNX encoder pooling config")
+    
+    def write_config(model_dir, max_seq_length, **pooling_modes):
+        os.makedirs(os.path.join(model_dir, "1_Pooling"), exist_ok=True)
+        with open(os.path.join(model_dir, "sentence_bert_config.json"), "w") as f:
+            json.dump({"max_seq_length": max_seq_length}, f)
+        with open(os.path.join(model_dir, "1_Pooling", "config.json"), "w") as f:
+            json.dump({"word_embedding_dimension": 4, **pooling_modes}, f)
+    
+    with tempfile.TemporaryDirectory() as model_dir:
+        write_config(model_dir, 128, pooling_mode_cls_token=True, pooling_mode_mean_tokens=False)
+        assert _read_sentence_transformer_config(model_dir) == ("cls", 128)
+        write_config(model_dir, 256, pooling_mode_mean_tokens=True)
+        assert _read_sentence_transformer_config(model_dir) == ("mean", 256)
+        write_config(model_dir, 256, pooling_mode_weightedmean_tokens=True)
+        for bad_dir in (model_dir, os.path.join(model_dir, "missing")):
+            try:
+                _read_sentence_transformer_config(bad_dir)
+                raise AssertionError("expected ValueError")
+            except ValueError:
+                pass
+    
+    # Padding tokens (mask 0) must not affect mean or max pooling
+    tokens = np.array([[[1.0, 2.0], [3.0, -4.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+    assert np.allclose(pool_token_embeddings(tokens, mask, "mean"), [[2.0, -1.0]])
+    assert np.allclose(pool_token_embeddings(tokens, mask, "max"), [[3.0, 2.0]])
+    assert np.allclose(pool_token_embeddings(tokens, mask, "cls"), [[1.0, 2.0]])
+    print("   ✅ Pooling mode and max length read from the exported config")
+    
+    # Against the real model when an export is available (python scripts/export_onnx.py)
+    model_name = "all-MiniLM-L6-v2"
+    if not os.path.exists(os.path.join(default_onnx_model_dir(model_name), "model_int8.onnx")):
+        print("   ⏭️  No ONNX export found; skipping comparison with the PyTorch model")
+        return
+    texts = ["neural networks learn from data", "linear regression fits a line", "tokenization splits text"]
+    onnx_embeddings = load_embedding_model(model_name, use_onnx=True).encode(texts, normalize_embeddings=True)
+    torch_embeddings = load_embedding_model(model_name).encode(texts, normalize_embeddings=True)
+    similarity = np.sum(onnx_embeddings * torch_embeddings, axis=1)
+    assert similarity.min() > 0.98, similarity
+    print(f"   ✅ ONNX embeddings match PyTorch (min cosine {similarity.min():.3f})")
+
+def test_merge_slice_segments():
+    """Words in the overlap between two audio slices are kept exactly once."""
+    print("\n🧪 Testing parallel transcription slice merge")
+    
+    def word(text, start):
+        return {"word": f" {text}", "start": start, "end": start + 0.4}
+    
+    # Slice 0 covers [0, 10) and hears 1s past its end; slice 1 covers [10, 20) and starts 1s early
+    slice_0 = [{"start": 8.0, "end": 10.6, "text": " hello boundary word",
+                "words": [word("hello", 8.0), word("boundary", 9.5), word("word", 10.2)]}]
+    slice_1 = [{"start": 0.5, "end": 3.0, "text": " boundary word again",
+                "words": [word("boundary", 0.5), word("word", 1.2), word("again", 2.6)]},
+               {"start": 4.0, "end": 5.0, "text": " no word timestamps"}]
+    
+    segments = merge_slice_segments([slice_0, slice_1], offsets=[0.0, 9.0], bounds=[(0.0, 10.0), (10.0, 20.0)])
+    
+    text = "".join(segment["text"] for segment in segments).split()
+    assert text == ["hello", "boundary", "word", "again", "no", "word", "timestamps"], text
+    assert [segment["id"] for segment in segments] == [0, 1, 2]
+    assert (segments[0]["start"], segments[0]["end"]) == (8.0, 9.9)
+    assert segments[1]["start"] == 10.2 and segments[2]["start"] == 13.0
+    print("   ✅ Overlap words deduplicated across slices")
+
 if __name__ == "__main__":
-    test_search_functionality() 
\ No newline at end of file
+    test_search_functionality()
+    test_incremental_add_chunks()
+    test_approximate_index_upgrade()
+    test_quantized_incremental_adds()
+    test_concurrent_search()
+    test_search_batch_frame()
+    test_batch_search_without_hits()
+    test_save_load_round_trip()
+    test_embedding_cache()
+    test_onnx_encoder_config()
+    test_merge_slice_segments() 
\ No newline at end of file
@@ -1,24 +1,221 @@
-import whisper
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
 import json
+import hashlib
+import io
+import math
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+# Heavy model libraries (whisper, sentence_transformers, torch) are imported
+# where used so that importing this module stays cheap
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 @dataclass
 class TranscriptChunk:
+    # No per-instance __dict__; chunk lists can run to millions of entries
+    __slots__ = ("video_id", "start_time", "end_time", "text")
+    
     video_id: str
     start_time: float
     end_time: float
     text: str
-    embedding: Optional[np.ndarray] = None
+
+def get_embedding_device() -> str:
+    """Pick the best available torch device for the embedding model."""
+    import torch
+    
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+def load_sentence_transformer(model_name: str) -> "SentenceTransformer":
+    """Load a sentence transformer on the best device, in fp16 on CUDA."""
+    from sentence_transformers import SentenceTransformer
+    
+    device = get_embedding_device()
+    model = SentenceTransformer(model_name, device=device)
+    if device == "cuda":
+        model.half()  # Halves memory traffic; outputs are cast back to float32 for FAISS
+    return model
+
+def default_onnx_model_dir(model_name: str) -> str:
+    """Where scripts/export_onnx.py writes the ONNX export of model_name by default."""
+    return os.path.join("onnx", model_name.split("/")[-1])
+
+def load_embedding_model(model_name: str, use_onnx: bool = False, onnx_model_dir: Optional[str] = None):
+    """Load the embedding backend: the int8 ONNX export of model_name, or the PyTorch model."""
+    if use_onnx:
+        return OnnxSentenceEncoder(onnx_model_dir or default_onnx_model_dir(model_name))
+    return load_sentence_transformer(model_name)
+
+# sentence-transformers pooling modes OnnxSentenceEncoder can reproduce
+ONNX_POOLING_MODES = ("mean", "cls", "max")
+
+def _read_sentence_transformer_config(model_dir: str) -> Tuple[str, int]:
+    """Pooling mode and max sequence length from the sentence-transformers config in model_dir."""
+    try:
+        with open(os.path.join(model_dir, "sentence_bert_config.json")) as f:
+            max_seq_length = json.load(f)["max_seq_length"]
+        with open(os.path.join(model_dir, "1_Pooling", "config.json")) as f:
+            pooling = json.load(f)
+    except FileNotFoundError as e:
+        raise ValueError(f"No sentence-transformers config in '{model_dir}' ({e.filename}); "
+                         f"re-run scripts/export_onnx.py") from None
+    
+    modes = [key[len("pooling_mode_"):] for key, enabled in pooling.items()
+             if key.startswith("pooling_mode_") and enabled]
+    modes = [mode.replace("_tokens", "").replace("_token", "") for mode in modes]
+    if len(modes) != 1 or modes[0] not in ONNX_POOLING_MODES:
+        raise ValueError(f"Unsupported pooling {modes} in '{model_dir}', expected one of {ONNX_POOLING_MODES}")
+    return modes[0], max_seq_length
+
+class OnnxSentenceEncoder:
+    """Drop-in for SentenceTransformer.encode backed by an onnxruntime session.
+    
+    Loads model_int8.onnx, tokenizer.json and the pooling and max-length config
+    written by scripts/export_onnx.py.
+    """
+    
+    def __init__(self, model_dir: str, model_file: str = "model_int8.onnx"):
+        self.pooling_mode, self.max_seq_length = _read_sentence_transformer_config(model_dir)
+        
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding()
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        """Embedding size, read from the model's token embedding output."""
+        return int(self.session.get_outputs()[0].shape[-1])
+    
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False) -> np.ndarray:
+        """Embed texts into an (N, d) float32 array."""
+        batches = []
+        for i in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i:i + batch_size])
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            inputs = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': attention_mask,
+                'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            token_embeddings = self.session.run(
+                None, {name: value for name, value in inputs.items() if name in self._input_names})[0]
+            
+            batches.append(pool_token_embeddings(token_embeddings, attention_mask, self.pooling_mode))
+        
+        embeddings = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(embeddings):
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+def pool_token_embeddings(token_embeddings: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    """Pool (N, T, d) token embeddings over real (non-padding) tokens as sentence-transformers does."""
+    if mode == "cls":
+        return token_embeddings[:, 0].astype(np.float32)
+    mask = attention_mask[:, :, None].astype(np.float32)
+    if mode == "max":
+        return np.where(mask > 0, token_embeddings, -1e9).max(axis=1).astype(np.float32)
+    return ((token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+DEFAULT_EMBEDDING_CACHE_DIR = "~/.cache/video_search/embeddings"
+# Most recently used embeddings kept in memory in front of the on-disk cache
+EMBEDDING_MEMORY_CACHE_SIZE = 10000
+
+def merge_slice_segments(slice_segments: List[List[Dict]], offsets: List[float],
+                         bounds: List[Tuple[float, float]]) -> List[Dict]:
+    """Merge Whisper segments from overlapping audio slices onto one timeline.
+    
+    slice_segments[i] holds slice i's segments with times relative to the
+    slice, which starts at offsets[i] seconds into the video. Only words whose
+    start falls in bounds[i] = (start, end) are kept, so each word in an
+    overlap is taken from exactly one slice; segments are rebuilt from their
+    kept words. Segments without word timestamps are kept or dropped whole by
+    their start time. The last slice keeps everything past its start.
+    """
+    merged = []
+    for i, (segments, offset, (start, end)) in enumerate(zip(slice_segments, offsets, bounds)):
+        if i == len(slice_segments) - 1:
+            end = math.inf
+        for segment in segments:
+            words = segment.get("words")
+            if not words:
+                if start <= segment["start"] + offset < end:
+                    merged.append(dict(segment, id=len(merged),
+                                       start=segment["start"] + offset,
+                                       end=segment["end"] + offset))
+                continue
+            kept = [dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                    for word in words if start <= word["start"] + offset < end]
+            if kept:
+                merged.append(dict(segment, id=len(merged), words=kept,
+                                   start=kept[0]["start"], end=kept[-1]["end"],
+                                   text="".join(word["word"] for word in kept)))
+    return merged
 
 class TranscriptProcessor:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        """Initialize the transcript processor with Whisper and sentence transformer models."""
-        self.whisper_model = whisper.load_model("base")
-        self.embedding_model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2",
+                 cache_dir: Optional[str] = DEFAULT_EMBEDDING_CACHE_DIR,
+                 use_onnx: bool = False, onnx_model_dir: Optional[str] = None):
+        """Initialize the transcript processor with Whisper and sentence transformer models.
+        
+        cache_dir: directory of the on-disk embedding cache, or None to cache in memory only.
+        use_onnx, onnx_model_dir: embed with the int8 ONNX export (default onnx/<model name>).
+        """
+        self.model_name = model_name
+        self.use_onnx = use_onnx
+        self.onnx_model_dir = onnx_model_dir or default_onnx_model_dir(model_name)
+        # Quantized ONNX embeddings differ slightly from PyTorch ones, so cache them per model file
+        self._embedding_cache_namespace = (
+            f"onnx:{os.path.abspath(os.path.join(self.onnx_model_dir, 'model_int8.onnx'))}"
+            if use_onnx else model_name)
+        self._whisper_model = None  # Loaded on first transcription
+        self._extra_whisper_models: List = []  # Per-worker copies for transcribe_video_parallel
+        self._embedding_model = None  # Loaded on first cache miss
+        self._emb_memory_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()  # LRU order
+        self._emb_cache_lock = threading.Lock()  # Guards both caches; processors may be shared across threads
+        self._emb_cache_db = None
+        if cache_dir is not None:
+            cache_dir = os.path.expanduser(cache_dir)
+            os.makedirs(cache_dir, exist_ok=True)
+            self._emb_cache_db = sqlite3.connect(os.path.join(cache_dir, "cache.db"), check_same_thread=False)
+            self._emb_cache_db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)")
+    
+    @property
+    def embedding_model(self):
+        """Sentence transformer, loaded on first access so fully cached runs never pay for it."""
+        if self._embedding_model is None:
+            self._embedding_model = load_embedding_model(self.model_name, self.use_onnx, self.onnx_model_dir)
+        return self._embedding_model
+    
+    @property
+    def whisper_model(self):
+        """Whisper model, loaded on first access so embedding-only use never pays for it."""
+        if self._whisper_model is None:
+            import whisper
+            self._whisper_model = whisper.load_model("base")
+        return self._whisper_model
         
     def transcribe_video(self, video_path: str, video_id: str) -> List[Dict]:
         """Transcribe a video using Whisper and return segments with timestamps."""
@@ -26,66 +223,195 @@ class TranscriptProcessor:
         result = self.whisper_model.transcribe(video_path)
         return result["segments"]  # type: ignore
     
+    def transcribe_video_parallel(self, video_path: str, video_id: str, n_workers: int = 4,
+                                  overlap_seconds: float = 1.0) -> List[Dict]:
+        """Transcribe a video by splitting its audio into slices transcribed in parallel threads.
+        
+        Each slice is padded by overlap_seconds on both sides so words at a
+        boundary aren't cut off, then only the words starting inside the slice's
+        own span are kept (see merge_slice_segments). Whisper models keep
+        per-call decoding state, so every worker gets its own model instance.
+        """
+        from whisper.audio import load_audio, SAMPLE_RATE
+        
+        print(f"Transcribing video: {video_id} ({n_workers} workers)")
+        audio = load_audio(video_path)
+        
+        slice_samples = math.ceil(len(audio) / max(n_workers, 1))
+        if n_workers <= 1 or slice_samples == 0:
+            return self.whisper_model.transcribe(audio)["segments"]  # type: ignore
+        
+        overlap_samples = int(overlap_seconds * SAMPLE_RATE)
+        starts = list(range(0, len(audio), slice_samples))
+        padded_starts = [max(start - overlap_samples, 0) for start in starts]
+        slices = [audio[padded:start + slice_samples + overlap_samples]
+                  for padded, start in zip(padded_starts, starts)]
+        
+        models: "queue.Queue" = queue.Queue()
+        for model in self._whisper_models(min(n_workers, len(slices))):
+            models.put(model)
+        
+        def transcribe_slice(audio_slice):
+            model = models.get()
+            try:
+                return model.transcribe(audio_slice, word_timestamps=True)["segments"]
+            finally:
+                models.put(model)
+        
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(transcribe_slice, slices))
+        
+        offsets = [padded / SAMPLE_RATE for padded in padded_starts]
+        bounds = [(start / SAMPLE_RATE, (start + slice_samples) / SAMPLE_RATE) for start in starts]
+        return merge_slice_segments(results, offsets, bounds)
+    
+    def _whisper_models(self, count: int) -> List:
+        """The shared Whisper model plus enough extra copies for count concurrent workers."""
+        import whisper
+        
+        models = [self.whisper_model] + self._extra_whisper_models
+        while len(models) < count:
+            extra = whisper.load_model("base")
+            self._extra_whisper_models.append(extra)
+            models.append(extra)
+        return models[:count]
+    
     def chunk_transcript(self, segments: List[Dict], video_id: str, 
                         chunk_duration: float = 30.0) -> List[TranscriptChunk]:
         """Chunk transcript segments into ~30-second chunks."""
         chunks = []
-        current_chunk_text = []
+        # Text of the current chunk is streamed into one buffer as " text" per segment
+        buf = io.StringIO()
+        write = buf.write
+        strip = str.strip
+        seg_count = 0
         current_start_time = segments[0]["start"] if segments else 0.0
         
         for segment in segments:
             segment_start = segment["start"]
-            segment_end = segment["end"]
-            segment_text = segment["text"].strip()
             
             # If adding this segment would exceed chunk duration, save current chunk
-            if segment_end - current_start_time > chunk_duration and current_chunk_text:
+            if segment["end"] - current_start_time > chunk_duration and seg_count:
                 chunk = TranscriptChunk(
                     video_id=video_id,
                     start_time=current_start_time,
                     end_time=segment_start,
-                    text=" ".join(current_chunk_text)
+                    text=buf.getvalue()[1:]
                 )
                 chunks.append(chunk)
                 
                 # Start new chunk
-                current_chunk_text = [segment_text]
+                buf.seek(0)
+                buf.truncate()
+                seg_count = 0
                 current_start_time = segment_start
-            else:
-                current_chunk_text.append(segment_text)
+            
+            write(" ")
+            write(strip(segment["text"]))
+            seg_count += 1
         
         # Add the last chunk
-        if current_chunk_text:
+        if seg_count:
             chunk = TranscriptChunk(
                 video_id=video_id,
                 start_time=current_start_time,
-                end_time=segments[-1]["end"] if segments else 0.0,
-                text=" ".join(current_chunk_text)
+                end_time=segments[-1]["end"],
+                text=buf.getvalue()[1:]
             )
             chunks.append(chunk)
         
         return chunks
     
-    def embed_chunks(self, chunks: List[TranscriptChunk]) -> List[TranscriptChunk]:
-        """Generate embeddings for all chunks using sentence transformers."""
+    def embed_chunks_matrix(self, chunks: List[TranscriptChunk]) -> np.ndarray:
+        """Generate an (N, d) float32 embedding matrix, one row per chunk.
+        
+        Only texts missing from the embedding cache go through the model.
+        """
         texts = [chunk.text for chunk in chunks]
-        embeddings = self.embedding_model.encode(texts)
+        keys = [self._embedding_key(text) for text in texts]
+        cached = self._load_cached_embeddings(keys)
         
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk.embedding = embedding
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            new_embeddings = self.embedding_model.encode(list(missing.values()), normalize_embeddings=True,
+                                                         convert_to_numpy=True, batch_size=128,
+                                                         show_progress_bar=False)
+            new_embeddings = np.asarray(new_embeddings, dtype=np.float32)
+            fresh = dict(zip(missing.keys(), new_embeddings))
+            self._store_cached_embeddings(fresh)
+            cached.update(fresh)
         
-        return chunks
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([cached[key] for key in keys])
+    
+    def _embedding_key(self, text: str) -> str:
+        """Cache key for a text: model (or ONNX model file) plus whitespace-normalized content."""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{self._embedding_cache_namespace}\0{normalized}".encode()).hexdigest()
+    
+    def _load_cached_embeddings(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up embeddings in the memory cache, then the on-disk cache."""
+        with self._emb_cache_lock:
+            memory = self._emb_memory_cache
+            found = {}
+            for key in keys:
+                if key in memory and key not in found:
+                    memory.move_to_end(key)
+                    found[key] = memory[key]
+            
+            if self._emb_cache_db is not None:
+                lookup = list(set(keys) - found.keys())
+                # Stay under SQLite's bound-parameter limit
+                for i in range(0, len(lookup), 500):
+                    batch = lookup[i:i + 500]
+                    rows = self._emb_cache_db.execute(
+                        f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch)
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+                self._remember_embeddings({key: found[key] for key in lookup if key in found})
+        
+        return found
     
-    def process_video(self, video_path: str, video_id: str) -> List[TranscriptChunk]:
+    def _store_cached_embeddings(self, embeddings: Dict[str, np.ndarray]):
+        """Add newly computed embeddings to the memory and on-disk caches."""
+        with self._emb_cache_lock:
+            self._remember_embeddings(embeddings)
+            if self._emb_cache_db is not None:
+                with self._emb_cache_db:
+                    self._emb_cache_db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                        [(key, embedding.tobytes()) for key, embedding in embeddings.items()])
+    
+    def _remember_embeddings(self, embeddings: Dict[str, np.ndarray]):
+        """Insert into the in-memory LRU, evicting the least recently used entries. Caller holds the lock."""
+        memory = self._emb_memory_cache
+        memory.update(embeddings)
+        for key in embeddings:
+            memory.move_to_end(key)
+        while len(memory) > EMBEDDING_MEMORY_CACHE_SIZE:
+            memory.popitem(last=False)
+    
+    def process_video(self, video_path: str, video_id: str) -> Tuple[List[TranscriptChunk], np.ndarray]:
         """Complete pipeline: transcribe, chunk, and embed a video."""
         segments = self.transcribe_video(video_path, video_id)
         chunks = self.chunk_transcript(segments, video_id)
-        chunks_with_embeddings = self.embed_chunks(chunks)
-        return chunks_with_embeddings
+        embeddings = self.embed_chunks_matrix(chunks)
+        return chunks, embeddings
 
 # Mock data generator for demo purposes
-def generate_mock_transcripts() -> List[TranscriptChunk]:
-    """Generate mock transcript chunks for demonstration."""
+def generate_mock_transcripts(model_name: str = "all-MiniLM-L6-v2",
+                              cache_dir: Optional[str] = "cache") -> Tuple[List[TranscriptChunk], np.ndarray]:
+    """Generate mock transcript chunks for demonstration.
+    
+    Embeddings are cached in cache_dir keyed by model name and a hash of the
+    chunk texts, so later runs skip loading the models. Pass cache_dir=None
+    to always re-embed.
+    """
     mock_data = [
         {
             "video_id": "video_001",
@@ -149,7 +475,6 @@ def generate_mock_transcripts() -> List[TranscriptChunk]:
         }
     ]
     
-    processor = TranscriptProcessor()
     all_chunks = []
     
     for video_data in mock_data:
@@ -163,5 +488,20 @@ def generate_mock_transcripts() -> List[TranscriptChunk]:
             )
             all_chunks.append(chunk)
     
+    # Reuse cached embeddings if these exact texts were embedded before
+    cache_path = None
+    if cache_dir is not None:
+        text_hash = hashlib.sha256("\0".join(chunk.text for chunk in all_chunks).encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{model_name.replace('/', '_')}_{text_hash}.npy")
+        if os.path.exists(cache_path):
+            return all_chunks, np.load(cache_path, mmap_mode='r')
+    
     # Generate embeddings for all chunks
-    return processor.embed_chunks(all_chunks) 
\ No newline at end of file
+    processor = TranscriptProcessor(model_name)
+    embeddings = processor.embed_chunks_matrix(all_chunks)
+    
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)  # type: ignore
+        np.save(cache_path, embeddings)
+    
+    return all_chunks, embeddings 
\ No newline at end of file